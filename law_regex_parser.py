@@ -1,6 +1,8 @@
+import asyncio
 import os
 import re
 import fitz  # PyMuPDF
+from functools import lru_cache
 from typing import Annotated, Literal
 from typing_extensions import TypedDict
 from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
@@ -32,49 +34,78 @@ llm = ChatHuggingFace(llm=endpoint_llm)
 
 
 # 4. 法律文件处理工具
+# 条文起始标记（匹配：换行后的第x条），模块级编译一次
+_CLAUSE_HEAD = re.compile(r'\n第[一二三四五六七八九十百]+条')
+
+
+def _preview_clauses(full_text, n=3):
+    """按条文起始位置分条，只切出前 n 条，返回 (总条数, 前 n 条)"""
+    starts = [0] + [m.start() for m in _CLAUSE_HEAD.finditer(full_text)]
+    ends = starts[1:n + 1] + [len(full_text)]
+    return len(starts), [full_text[a:b] for a, b in zip(starts[:n], ends)]
+
+
+@lru_cache(maxsize=32)
+def _load_text(path, mtime):
+    """读取 PDF 全文，按 (路径, 修改时间) 缓存，文件更新后自动失效"""
+    doc = fitz.open(path)
+    full_text = "".join(page.get_text("text", sort=True) for page in doc)
+    doc.close()
+    return full_text
+
+
 class LawFileTool:
     def __init__(self, directory):
         self.directory = directory
 
     def search_and_parse(self, keyword: str, target_clause: str = None):
         """搜索 PDF 并解析特定条文"""
-        # 在文件夹中匹配文件
-        files = [f for f in os.listdir(self.directory) if keyword in f and f.endswith('.pdf')]
-        if not files:
+        # 在文件夹中匹配文件，mtime 作为缓存键的一部分，文件更新后缓存失效
+        with os.scandir(self.directory) as it:
+            entries = [e for e in it if keyword in e.name and e.name.endswith('.pdf')]
+        if not entries:
             return f"未找到包含 '{keyword}' 的法律文件。"
 
-        file_path = os.path.join(self.directory, files[0])
-        doc = fitz.open(file_path)
-        full_text = "".join([page.get_text() for page in doc])
-        doc.close()
-
-        #
-        # 使用正则分条（匹配：第x条）
-        clauses = re.split(r'(?=\n第[一二三四五六七八九十百]+条)', full_text)
+        entry = entries[0]
+        mtime = entry.stat().st_mtime
 
         if target_clause:
-            # 搜索特定条文
-            for c in clauses:
-                if target_clause in c:
-                    return f"已在《{files[0]}》中找到：\n{c.strip()}"
+            # 搜索特定条文：直接在全文中定位条文开头，截至下一条或文末，无需分条
+            full_text = _load_text(entry.path, mtime)
+            m = re.search(
+                rf'(?:\A|\n){re.escape(target_clause)}.*?(?={_CLAUSE_HEAD.pattern}|\Z)',
+                full_text, flags=re.S,
+            )
+            if m:
+                return f"已在《{entry.name}》中找到：\n{m.group(0).strip()}"
             return f"文件中未找到 {target_clause}。"
 
         # 如果没指定条文，返回前3条作为预览
-        return f"已找到文件《{files[0]}》，共有 {len(clauses)} 条。前3条预览：\n" + "\n".join(clauses[:3])
+        count, preview = _preview_clauses(_load_text(entry.path, mtime))
+        return f"已找到文件《{entry.name}》，共有 {count} 条。前3条预览：\n" + "\n".join(preview)
 
 
 law_tool = LawFileTool(directory="/Users/lxj/Documents/Law")
 
 
 # 5. 定义节点逻辑
+# 系统提示固定不变，模块级构建一次，每次调用前缀一致
+_SYSTEM_MSG = SystemMessage(content=(
+    "你是一个法律助手。用户要求解析法律时，你必须：\n"
+    "1. 将阿拉伯数字转换为中文大写数字（如：将32改为三十二）。\n"
+    "2. 严格按此格式回复：[PARSE_LAW:文件名关键字,第XX条]。\n"
+    "例如用户说：'解析反洗钱法第32条'，你回复：'[PARSE_LAW:反洗钱,第三十二条]'。"
+))
+
+
+@lru_cache(maxsize=1024)
+def _invoke_cached(user_text: str) -> str:
+    """相同提问直接命中缓存，避免重复调用远端模型"""
+    return llm.invoke([_SYSTEM_MSG, HumanMessage(content=user_text)]).content
+
+
 def chatbot_node(state: State):
-    system_msg = SystemMessage(content=(
-        "你是一个法律助手。用户要求解析法律时，你必须：\n"
-        "1. 将阿拉伯数字转换为中文大写数字（如：将32改为三十二）。\n"
-        "2. 严格按此格式回复：[PARSE_LAW:文件名关键字,第XX条]。\n"
-        "例如用户说：'解析反洗钱法第32条'，你回复：'[PARSE_LAW:反洗钱,第三十二条]'。"
-    ))
-    response = llm.invoke([system_msg, state["messages"][-1]])
+    response = AIMessage(content=_invoke_cached(state["messages"][-1].content))
     return {"messages": [response]}
 
 
@@ -117,15 +148,26 @@ workflow.add_conditional_edges("chatbot", route_decision)
 workflow.add_edge("tools", END)
 app = workflow.compile()
 
+
 # 7. 运行
-if __name__ == "__main__":
+async def _print_reply(u_input):
+    # 与同步 stream 一样逐节点输出；未开启逐 token 流式，输出内容与之前相同
+    async for event in app.astream({"messages": [HumanMessage(content=u_input)]}):
+        for value in event.values():
+            print(f"Assistant: {value['messages'][-1].content}")
+
+
+def main():
     print("--- 法律解析助手已就绪 ---")
     while True:
         sys.stdout.write("\nUser: ")
         sys.stdout.flush()
+        # 在事件循环之外同步读取输入：asyncio.run 接管 SIGINT 后阻塞的 readline 无法被 Ctrl-C 打断
         raw_data = sys.stdin.buffer.readline()
         u_input = raw_data.decode('utf-8', errors='ignore').strip()
         if u_input.lower() == 'q': break
-        for event in app.stream({"messages": [HumanMessage(content=u_input)]}):
-            for value in event.values():
-                print(f"Assistant: {value['messages'][-1].content}")
\ No newline at end of file
+        asyncio.run(_print_reply(u_input))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import re
 import psycopg2
+from psycopg2.extras import execute_values
 from docling.document_converter import DocumentConverter
 from docling.datamodel.base_models import DocItemLabel
 
@@ -12,6 +13,10 @@ CN_NUM = {'零': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6,
 def cn_to_int(cn):
     """将'第一百二十三'这种格式解析为 123，确保 URI 的唯一性"""
     if not cn: return 0
+    # 常规写法直接查表，非常规写法（如'一百十五'）再逐字解析
+    val = CN_TABLE.get(cn)
+    if val is not None:
+        return val
     res, temp = 0, 0
     for char in cn:
         if char == '百':
@@ -25,12 +30,58 @@ def cn_to_int(cn):
     return res + temp
 
 
+def cn_encode(num):
+    """cn_to_int 的逆运算：将 123 编码为'一百二十三'（0~999）"""
+    if num == 0: return '零'
+    digits = '零一二三四五六七八九'
+    hundreds, tens, ones = num // 100, num // 10 % 10, num % 10
+    out = ''
+    if hundreds:
+        out += digits[hundreds] + '百'
+        if tens:
+            out += digits[tens] + '十'
+        elif ones:
+            out += '零'
+    elif tens:
+        # 十位开头时按习惯省略"一"（如：十五）
+        out += ('' if tens == 1 else digits[tens]) + '十'
+    if ones:
+        out += digits[ones]
+    return out
+
+
+# 预计算 0~999 的中文数字查表，供 cn_to_int 一次 dict 查找即可
+CN_TABLE = {cn_encode(i): i for i in range(1000)}
+
+# 行首分类：章 / 条（阿拉伯数字快速通道在前，现代法规中最常见），单次匹配即可分派
+# 前导空白由 ^\s* 吸收，分类部分可选，因此总能匹配，m.end() 即正文起点
+_LINE_RE = re.compile(
+    r'^\s*(?:第(?P<ch>[一二三四五六七八九十百]+)章'
+    r'|第(?P<num>[0-9]{1,4})条'
+    r'|第(?P<art>[0-9一二三四五六七八九十百]+)条)?'
+)
+
+# 噪声过滤：只针对页眉页脚这类短行，避免误删以"中华人民共和国"等开头的正文段落
+# 字面前缀走 startswith；页码必须整行匹配（如"第 3 页"、"- 3 -"）
+_NOISE_MAX_LEN = 30
+_NOISE_PREFIX = ('证监会', '页码', '[source', '中华人民共和国')
+_NOISE_RE = re.compile(r'(?:第\s*\d+\s*页(?:\s*共\s*\d+\s*页)?|-\s*\d+\s*-)\s*$')  # 配合 match(text, pos) 在 pos 处锚定
+
+# 每累计这么多节点就落库提交一次，避免整篇文档占用一个长事务
+COMMIT_BATCH = 200
+
+# 清洗用删除表：一次 translate 去掉换行、空格、制表符与回车
+_DROP_TBL = str.maketrans('', '', '\n \t\r')
+
+
 # ==========================================
 # 2. 法律结构化解析引擎 (仿 Cornell LII)
 # ==========================================
 class LegalStructureEngine:
     def __init__(self, db_config):
         self.converter = DocumentConverter()
+        self._pending_nodes = {}  # uri -> 待写入节点行，同一 uri 以最后一次为准
+        self._content_buf = {}  # uri -> 待追加的正文片段
         try:
             self.conn = psycopg2.connect(**db_config)
             self.cur = self.conn.cursor()
@@ -54,6 +105,9 @@ class LegalStructureEngine:
             ON CONFLICT (doc_id) DO UPDATE SET title = EXCLUDED.title;
         """, (doc_id, metadata['title'], metadata['creator'], metadata['date']))
 
+        self._pending_nodes.clear()
+        self._content_buf.clear()
+
         current_c_uri = None  # 当前章节 URI (如 /fxqf/c1)
         active_uri = None  # 当前活跃节点 (可能是章或条)
         has_entered_body = False  # 跳过目录的关键开关
@@ -62,16 +116,21 @@ class LegalStructureEngine:
 
         # 线性遍历文档对象流
         for item, level in doc.iterate_items():
-            if not hasattr(item, "text") or not item.text:
+            if len(self._pending_nodes) >= COMMIT_BATCH:
+                self._flush()
+                self.conn.commit()
+
+            text = getattr(item, "text", None)
+            if not text:
                 continue
 
-            text = item.text.strip()
+            m = _LINE_RE.match(text)
+            kind = m.lastgroup
 
             # --- A. 识别章节 (Chapter) ---
             # 解决第三章丢失：不再只认 SECTION_HEADER，兼容所有标签
-            c_match = re.match(r'^第([一二三四五六七八九十百]+)章', text)
-            if c_match:
-                c_num_str = c_match.group(1)
+            if kind == 'ch':
+                c_num_str = m.group('ch')
                 c_val = cn_to_int(c_num_str)
 
                 # 智能目录过滤：如果看到第一章且后面紧跟目录特征，则不设为正文
@@ -96,21 +155,25 @@ class LegalStructureEngine:
 
                     # 2. 【关键】更新 text 为后半部分（例如："第一条 为了..."）
                     text = text[split_idx:].strip()
+                    m = _LINE_RE.match(text)
+                    kind = m.lastgroup
                     print(f"✂️ 自动拆分粘连章节: [{chapter_title}] <-> [{text[:10]}...]")
 
                     # 3. ⚠️ 这里绝对不能 continue！
                     # 让代码继续往下走，流转到 "--- B. 识别条文 ---"，从而正确生成 a1 节点
                 else:
                     # 正常情况：只有章节标题，没有粘连
-                    self._save_node(doc_id, current_c_uri, "chapter", c_val, text, None)
+                    self._save_node(doc_id, current_c_uri, "chapter", c_val, text.strip(), None)
                     continue  # 正常结束本次循环
 
             # --- B. 识别条文 (Section) ---
-            a_match = re.match(r'^第([0-9一二三四五六七八九十百]+)条', text)
-            if a_match:
+            if kind == 'num' or kind == 'art':
                 has_entered_body = True
-                a_num_str = a_match.group(1)
-                a_val = int(a_num_str) if a_num_str.isdigit() else cn_to_int(a_num_str)
+                a_num_str = m.group(kind)
+                if kind == 'num' or a_num_str.isdigit():
+                    a_val = int(a_num_str)
+                else:
+                    a_val = cn_to_int(a_num_str)
 
                 if not current_c_uri:
                     current_c_uri = f"/{doc_id.lower()}/c1"
@@ -119,34 +182,58 @@ class LegalStructureEngine:
                 active_uri = article_uri
 
                 # ✅ 修改点：在这里对首行进行清洗，确保存入时末尾没有换行符
-                header_cleaned = text.replace('\n', '').replace(' ', '')
+                header_cleaned = text.strip().translate(_DROP_TBL)
                 self._save_node(doc_id, article_uri, "section", a_val, header_cleaned, current_c_uri)
                 continue
 
             # --- C. 内容追加 (Append Content) ---
             if has_entered_body and active_uri:
-                # ... (保留原有的噪声过滤逻辑)
+                # 噪声过滤：页眉页脚、页码等
+                start = m.end()
+                if len(text) - start <= _NOISE_MAX_LEN and (
+                        text.startswith(_NOISE_PREFIX, start) or _NOISE_RE.match(text, start)):
+                    continue
 
                 # 清洗当前行文本
-                cleaned = text.replace('\n', '').replace(' ', '')
+                cleaned = text.strip().translate(_DROP_TBL)
 
                 # ✅ 修改点：去掉 "\n" +，改用一个空格 ' ' 衔接，或者直接衔接
                 # 如果希望完全没有换行或空格，就直接用 cleaned
-                self.cur.execute("""
-                    UPDATE legal_nodes SET content = content || %s 
-                    WHERE uri = %s
-                """, (' ' + cleaned, active_uri))  # ' ' 确保“第三条”和“为了预防...”之间不会粘连
+                # ' ' 确保“第三条”和“为了预防...”之间不会粘连；先缓冲，随下一次 _flush 批量写入
+                self._content_buf.setdefault(active_uri, []).append(' ' + cleaned)
 
+        self._flush()
         self.conn.commit()
         print(f"✅ {doc_id} 已解析为 LII 结构化数据，共计完成颗粒度切分。")
 
     def _save_node(self, doc_id, uri, label, num, content, parent):
-        self.cur.execute("""
-            INSERT INTO legal_nodes (doc_id, uri, label, num_val, content, parent_uri)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (uri) DO UPDATE 
-            SET content = EXCLUDED.content, parent_uri = EXCLUDED.parent_uri, label = EXCLUDED.label;
-        """, (doc_id, uri, label, num, content, parent))
+        # 重复保存同一节点会覆盖其正文，此前缓冲的追加内容随之作废
+        self._content_buf.pop(uri, None)
+        self._pending_nodes[uri] = (doc_id, uri, label, num, content, parent)
+
+    def _flush(self):
+        """将缓冲的节点与正文追加批量写入数据库，避免逐行往返
+
+        每类写入整批只发一条多行语句（page_size 取满），服务端每批只规划一次。
+        """
+        if self._pending_nodes:
+            rows = list(self._pending_nodes.values())
+            execute_values(self.cur, """
+                INSERT INTO legal_nodes (doc_id, uri, label, num_val, content, parent_uri)
+                VALUES %s
+                ON CONFLICT (uri) DO UPDATE 
+                SET content = EXCLUDED.content, parent_uri = EXCLUDED.parent_uri, label = EXCLUDED.label;
+            """, rows, page_size=len(rows))
+            self._pending_nodes.clear()
+
+        if self._content_buf:
+            rows = [(uri, ''.join(parts)) for uri, parts in self._content_buf.items()]
+            execute_values(self.cur, """
+                UPDATE legal_nodes AS n SET content = n.content || v.extra
+                FROM (VALUES %s) AS v (uri, extra)
+                WHERE n.uri = v.uri
+            """, rows, page_size=len(rows))
+            self._content_buf.clear()
 
 
 # ==========================================